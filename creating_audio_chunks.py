@@ -4,19 +4,183 @@ Audio Transcription → Vocabulary Extraction → Interactive Learning
 """
 
 import streamlit as st
+import asyncio
 import os
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI, OpenAI
 from dotenv import load_dotenv
+import csv
+import io
 import json
+import math
+import operator
+import orjson
+import queue
+import re
+import hashlib
+import sqlite3
+import string
+import time
+import unicodedata
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Load environment variables
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# Initialize OpenAI client
-if OPENAI_API_KEY:
-    client = OpenAI(api_key=OPENAI_API_KEY)
+# Finished API results are kept here so they survive server restarts
+CACHE_DB_PATH = Path(".cache") / "cache.db"
+CACHE_TABLES = ("transcription", "vocab", "quiz")
+# Transcripts and vocabulary are requested again once their entry is older
+# than this many seconds. Quiz questions don't expire.
+RESULT_CACHE_TTL = 3600
+
+# Connection settings for the HTTP clients under the OpenAI SDK. HTTP/2
+# multiplexes concurrent requests over one kept-alive TLS connection.
+OPENAI_HTTP_TIMEOUT = 60
+OPENAI_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=50)
+
+
+@st.cache_resource
+def get_openai_client():
+    """
+    Return the OpenAI client shared by all reruns and sessions.
+
+    Streamlit re-executes this script on every rerun, so a module-level
+    client would be rebuilt, along with its connection pool, on each
+    interaction.
+    """
+    http_client = httpx.Client(
+        http2=True, timeout=OPENAI_HTTP_TIMEOUT, limits=OPENAI_HTTP_LIMITS
+    )
+    return OpenAI(api_key=OPENAI_API_KEY, http_client=http_client)
+
+
+@st.cache_resource
+def get_cache_db():
+    """
+    Open the SQLite result cache shared by all reruns and sessions.
+
+    Each table maps a content hash to a JSON-encoded API result and the
+    time it was stored. Autocommit mode makes every statement its own
+    transaction, so sessions writing from different threads can't
+    interleave.
+    """
+    CACHE_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(
+        CACHE_DB_PATH, check_same_thread=False, isolation_level=None
+    )
+    for table in CACHE_TABLES:
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(key TEXT PRIMARY KEY, json TEXT, created REAL)"
+        )
+        # Databases from before entries had a timestamp; their rows count
+        # as expired
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if "created" not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN created REAL")
+    return conn
+
+
+def cache_get(conn, table, key, max_age=None):
+    """
+    Return the cached result for key in table, or None on a miss.
+
+    The connection is passed in rather than looked up through get_cache_db,
+    so background threads without a Streamlit script context can use it.
+
+    Args:
+        conn: Result cache connection from get_cache_db
+        table: One of CACHE_TABLES
+        key: Cache key of the result
+        max_age: Seconds after which an entry counts as a miss; entries
+            never expire if omitted
+    """
+    if max_age is None:
+        row = conn.execute(
+            f"SELECT json FROM {table} WHERE key = ?", (key,)
+        ).fetchone()
+    else:
+        row = conn.execute(
+            f"SELECT json FROM {table} WHERE key = ? AND created >= ?",
+            (key, time.time() - max_age),
+        ).fetchone()
+    return orjson.loads(row[0]) if row else None
+
+
+def cache_put(conn, table, key, value):
+    """Store a successful API result under key in table."""
+    conn.execute(
+        f"INSERT OR REPLACE INTO {table} (key, json, created) VALUES (?, ?, ?)",
+        (key, orjson.dumps(value).decode("utf-8"), time.time()),
+    )
+
+
+class JsonItemParser:
+    """
+    Incrementally parse the objects of a streamed {"items": [...]} response.
+
+    Tracks brace depth outside of string literals, so an item is parsed as
+    soon as its closing brace arrives instead of after the whole response.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.item_start = None
+
+    def feed(self, delta):
+        """
+        Consume the next fragment of the JSON document.
+
+        Args:
+            delta: Text fragment, continuing the previous ones
+
+        Returns:
+            List of item dictionaries completed by this fragment
+        """
+        items = []
+        offset = len(self.text)
+        self.text += delta
+        for i, ch in enumerate(delta, offset):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                self.depth += 1
+                # depth 1 is the root object, 2 the items array
+                if ch == "{" and self.depth == 3:
+                    self.item_start = i
+            elif ch in "}]":
+                if ch == "}" and self.depth == 3:
+                    items.append(orjson.loads(self.text[self.item_start : i + 1]))
+                self.depth -= 1
+        return items
+
+
+def open_async_client():
+    """
+    Open an AsyncOpenAI client for one asyncio.run call.
+
+    Its connection pool is tied to the event loop it was first used on, so
+    unlike the sync client it can't be shared across reruns. Use it as an
+    async context manager so the pool is closed with the loop.
+    """
+    http_client = httpx.AsyncClient(
+        http2=True, timeout=OPENAI_HTTP_TIMEOUT, limits=OPENAI_HTTP_LIMITS
+    )
+    return AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=http_client)
 
 
 # ============================================================================
@@ -24,84 +188,235 @@ if OPENAI_API_KEY:
 # ============================================================================
 
 
-def transcribe_audio_file(audio_file_path):
+# Transcription engines offered in the sidebar. The local engine runs an
+# int8-quantized faster-whisper model on the CPU and needs the optional
+# faster-whisper package.
+TRANSCRIPTION_ENGINES = {"cloud": "☁️ Cloud (OpenAI)", "local": "💻 Local (int8)"}
+TRANSCRIPTION_MODEL = "gpt-4o-transcribe"
+LOCAL_WHISPER_MODEL = "base"
+
+
+@st.cache_resource(show_spinner="Loading local transcription model...")
+def get_local_whisper():
+    """
+    Load the local faster-whisper model once per process.
+
+    Loading and quantizing the model takes far longer than a short clip
+    takes to transcribe, so it must not happen per call.
+    """
+    from faster_whisper import WhisperModel
+
+    return WhisperModel(LOCAL_WHISPER_MODEL, device="cpu", compute_type="int8")
+
+
+def _stream_local_transcription(model, audio_bytes):
+    """Yield the transcript text of the audio bytes segment by segment."""
+    segments, _ = model.transcribe(
+        io.BytesIO(audio_bytes),
+        language="de",
+        beam_size=1,
+        initial_prompt="This is a conversation in German language.",
+    )
+    for segment in segments:
+        yield segment.text
+
+
+def _stream_transcription(file_name, audio_bytes, mime_type):
+    """Yield the transcript text of the audio bytes as the API produces it."""
+    stream = get_openai_client().audio.transcriptions.create(
+        file=(file_name, audio_bytes, mime_type),
+        model=TRANSCRIPTION_MODEL,
+        language="de",
+        response_format="text",
+        prompt="This is a conversation in German language.",
+        stream=True,
+    )
+    for event in stream:
+        if event.type == "transcript.text.delta":
+            yield event.delta
+
+
+def transcribe_audio_file(audio_file, engine="cloud"):
     """
     You are a German language transcription assistant, the audio provided to you is from a german language class conversation, where there is a mixed language of german, english and hindi being spoken. You should only transcribe the german parts of the audio, and ignore any english or hindi parts. Please provide the transcription in german language only, do not translate to english.
 
     Args:
-        audio_file_path: Path to audio file
+        audio_file: Path to audio file, or a (filename, bytes, mime type) tuple
+        engine: Key of TRANSCRIPTION_ENGINES to transcribe with
 
     Returns:
         Transcribed German text
     """
     try:
-        with open(audio_file_path, "rb") as audio_file:
-            transcription = client.audio.transcriptions.create(
-                file=audio_file,
-                model="gpt-4o-transcribe",
-                language="de",
-                response_format="text",
-                prompt="This is a conversation in German language.",
-            )
-        return transcription
+        if isinstance(audio_file, (str, Path)):
+            audio_path = Path(audio_file)
+            audio_file = (audio_path.name, audio_path.read_bytes(), None)
+
+        # Identical audio is only transcribed once per model; new audio is
+        # written out as it streams in
+        model_name = LOCAL_WHISPER_MODEL if engine == "local" else TRANSCRIPTION_MODEL
+        key = f"{engine}:{model_name}:{hashlib.sha256(audio_file[1]).hexdigest()}"
+        transcript = cache_get(
+            get_cache_db(), "transcription", key, max_age=RESULT_CACHE_TTL
+        )
+        if transcript is None:
+            if engine == "local":
+                try:
+                    model = get_local_whisper()
+                except ImportError:
+                    st.error(
+                        "Local transcription needs faster-whisper: "
+                        "`pip install faster-whisper`"
+                    )
+                    return None
+                stream = _stream_local_transcription(model, audio_file[1])
+            else:
+                stream = _stream_transcription(*audio_file)
+            transcript = st.write_stream(stream).strip()
+            # An empty transcript is more likely a failed request than silent
+            # audio, so it is asked for again next time
+            if transcript:
+                cache_put(get_cache_db(), "transcription", key, transcript)
+        return transcript
     except Exception as e:
         st.error(f"Transcription error: {e}")
         return None
 
 
-def transcribe_uploaded_audio(uploaded_file):
+def transcribe_uploaded_audio(uploaded_file, engine="cloud"):
     """
     Transcribe audio from uploaded file.
 
+    The upload is already held in memory by Streamlit, so its bytes are
+    passed straight to the API instead of round-tripping through a temp
+    file. The original filename is kept so the API can tell the format
+    from its extension.
+
     Args:
         uploaded_file: Streamlit uploaded file object
+        engine: Key of TRANSCRIPTION_ENGINES to transcribe with
 
     Returns:
         Transcribed text
     """
-    # Save uploaded file temporarily
-    temp_path = f"temp_audio_{uploaded_file.name}"
+    return transcribe_audio_file(
+        (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type), engine
+    )
 
-    try:
-        with open(temp_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
 
-        # Transcribe
-        transcription = transcribe_audio_file(temp_path)
+# ============================================================================
+# STEP 2: VOCABULARY EXTRACTION
+# ============================================================================
 
-        # Clean up
-        os.remove(temp_path)
+# Structured Outputs schema: the model is constrained to emit exactly this
+# shape, so responses parse without any cleanup. Strict mode needs an
+# object at the root, hence the "items" wrapper.
+VOCABULARY_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "vocabulary",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "items": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "word": {"type": "string"},
+                            "translation": {"type": "string"},
+                            "pos": {"type": "string"},
+                            "article": {"type": "string"},
+                            "example": {"type": "string"},
+                            "b2_relevance": {"type": "string"},
+                        },
+                        "required": [
+                            "word",
+                            "translation",
+                            "pos",
+                            "article",
+                            "example",
+                            "b2_relevance",
+                        ],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["items"],
+            "additionalProperties": False,
+        },
+    },
+}
 
-        return transcription
 
-    except Exception as e:
-        st.error(f"Error processing audio: {e}")
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        return None
+# Long transcripts are split into chunks of about this many words, and up
+# to VOCAB_CONCURRENCY chunks are extracted at once. Each chunk's completion
+# is capped at VOCAB_MAX_TOKENS; items that finished before the cap are kept,
+# but a vocabulary with a truncated chunk is not cached.
+VOCAB_CHUNK_WORDS = 500
+VOCAB_CONCURRENCY = 8
+VOCAB_MAX_TOKENS = 4096
 
+# Extracted vocabulary is stored in the result cache under the prompt
+# version and model. Bump VOCAB_PROMPT_VERSION whenever the extraction
+# prompt or its request settings change.
+VOCAB_MODEL = "gpt-4o"
+VOCAB_PROMPT_VERSION = 2
 
-# ============================================================================
-# STEP 2: VOCABULARY EXTRACTION
-# ============================================================================
+# Chunks are closed at sentence ends or paragraph breaks
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
 
 
-def extract_b2_vocabulary(german_text):
+def chunk_text(text, words_per_chunk=VOCAB_CHUNK_WORDS):
     """
-    Extract important B2-level vocabulary from German text using OpenAI.
+    Split text into chunks of whole sentences, each at most words_per_chunk
+    words long.
+
+    Sentences are kept whole so the model sees them in full. A sentence
+    longer than words_per_chunk, e.g. from an unpunctuated transcript, is
+    cut at word boundaries instead.
 
     Args:
-        german_text: German text to analyze
+        text: Text to split
+        words_per_chunk: Word count at which a chunk is closed
 
     Returns:
-        List of vocabulary dictionaries
+        List of chunk strings, empty if text has no words
     """
-    prompt = f"""You are a German language teacher specializing in B1-level and above vocabulary.
+    chunks = []
+    current = []
+    current_words = 0
+    for sentence in SENTENCE_END_RE.split(text.strip()):
+        words = sentence.split()
+        for start in range(0, len(words), words_per_chunk):
+            piece = words[start : start + words_per_chunk]
+            if current and current_words + len(piece) > words_per_chunk:
+                chunks.append(" ".join(current))
+                current = []
+                current_words = 0
+            current.append(" ".join(piece))
+            current_words += len(piece)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+async def _stream_b2_vocabulary_async(client_async, german_text, truncated):
+    """
+    Yield each vocabulary item in german_text as the model completes it.
 
-Analyze the following German text and extract the most important words for B1-level and above learners.
+    Args:
+        client_async: AsyncOpenAI client to send the request with
+        german_text: German text to analyze
+        truncated: List that german_text is appended to if the completion
+            stopped at VOCAB_MAX_TOKENS
+    """
+    # The fixed instructions come first and the text last, so every request
+    # shares the same prompt prefix and can hit OpenAI's prompt cache
+    prompt = f"""You are a German language teacher specializing in B1-level and above vocabulary.
 
-Text:
-{german_text}
+Analyze the German text at the end of this message and extract the most important words for B1-level and above learners.
 
 For each important word, provide:
 1. The word in its base form (infinitive for verbs, nominative singular for nouns)
@@ -118,8 +433,8 @@ Focus on:
 - Professional/academic vocabulary
 - Skip basic A1/A2 words like "haben", "sein", "die", "der", "und", etc.
 
-Return the response as a JSON array with this structure:
-[
+Return the response as a JSON object whose "items" array has this structure:
+{{"items": [
   {{
     "word": "beantworten",
     "translation": "to answer, to reply",
@@ -136,37 +451,123 @@ Return the response as a JSON array with this structure:
     "example": "Die Kinder gehen jeden Tag in den Kindergarten.",
     "b2_relevance": "Common compound noun in family and education contexts"
   }}
-]
+]}}
 
-Return ONLY the JSON array, no markdown formatting, no other text."""
+Text:
+{german_text}"""
+
+    stream = await client_async.chat.completions.create(
+        model=VOCAB_MODEL,
+        messages=[
+            {
+                "role": "system",
+                "content": "You are a German language teaching assistant.",
+            },
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0,
+        max_tokens=VOCAB_MAX_TOKENS,
+        response_format=VOCABULARY_RESPONSE_FORMAT,
+        stream=True,
+    )
+    parser = JsonItemParser()
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        if chunk.choices[0].delta.content:
+            for item in parser.feed(chunk.choices[0].delta.content):
+                yield item
+        if chunk.choices[0].finish_reason == "length":
+            truncated.append(german_text)
+
+
+def _vocab_cache_key(german_text):
+    """Return the result cache key for the vocabulary of german_text."""
+    key = json.dumps(
+        [VOCAB_PROMPT_VERSION, VOCAB_MODEL, german_text], ensure_ascii=False
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a German language teaching assistant.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.3,
-        )
 
-        # Extract and parse JSON
-        content = response.choices[0].message.content.strip()
+def _vocabulary_key(word):
+    """Return the form of word used to spot duplicate vocabulary entries."""
+    return unicodedata.normalize("NFKC", word).strip().casefold()
 
-        # Remove markdown code blocks if present
-        if content.startswith("```json"):
-            content = content[7:]
-        if content.startswith("```"):
-            content = content[3:]
-        if content.endswith("```"):
-            content = content[:-3]
 
-        vocabulary = json.loads(content.strip())
-        return vocabulary
+def extract_b2_vocabulary(german_text):
+    """
+    Extract important B2-level vocabulary from German text using OpenAI.
 
+    The text is split into chunks that are extracted concurrently, so a long
+    transcript takes about as long as its slowest chunk. Results are merged
+    in text order with duplicates dropped.
+
+    Args:
+        german_text: German text to analyze
+
+    Returns:
+        List of vocabulary dictionaries, one per distinct word
+    """
+    try:
+        key = _vocab_cache_key(german_text)
+        vocabulary = cache_get(get_cache_db(), "vocab", key, max_age=RESULT_CACHE_TTL)
+        if vocabulary is not None:
+            return vocabulary
+
+        chunks = chunk_text(german_text)
+
+        # Show words as they arrive instead of waiting for every chunk
+        progress = st.empty()
+        found = {}
+        truncated = []
+
+        async def run_all():
+            semaphore = asyncio.Semaphore(VOCAB_CONCURRENCY)
+            async with open_async_client() as client_async:
+
+                async def worker(chunk):
+                    items = []
+                    async with semaphore:
+                        async for word_data in _stream_b2_vocabulary_async(
+                            client_async, chunk, truncated
+                        ):
+                            items.append(word_data)
+                            found.setdefault(
+                                _vocabulary_key(word_data["word"]), word_data["word"]
+                            )
+                            progress.caption(
+                                f"Found {len(found)} words: "
+                                + ", ".join(found.values())
+                            )
+                    return items
+
+                return await asyncio.gather(*(worker(chunk) for chunk in chunks))
+
+        results = asyncio.run(run_all()) if chunks else []
+        progress.empty()
+
+        # A word can come back more than once, from the same chunk or from
+        # several; every extra entry would cost its own quiz question
+        vocabulary = []
+        seen = set()
+        for items in results:
+            for word_data in items:
+                key_word = _vocabulary_key(word_data["word"])
+                if key_word not in seen:
+                    seen.add(key_word)
+                    vocabulary.append(word_data)
+
+        if truncated:
+            st.warning(
+                f"⚠️ {len(truncated)} of {len(chunks)} text parts hit the "
+                "response length limit, so some words may be missing. "
+                "Extract again to retry them."
+            )
+        # An empty or partial list is not stored, so the text can be
+        # extracted again
+        elif vocabulary:
+            cache_put(get_cache_db(), "vocab", key, vocabulary)
+        return vocabulary
     except Exception as e:
         st.error(f"Error extracting vocabulary: {e}")
         return []
@@ -176,78 +577,238 @@ Return ONLY the JSON array, no markdown formatting, no other text."""
 # STEP 3: QUIZ GENERATION
 # ============================================================================
 
+# Generated questions are stored in the result cache so the same word never
+# costs a second API call. Bump QUIZ_PROMPT_VERSION whenever the quiz prompt
+# changes.
+QUIZ_PROMPT_VERSION = 2
+
+# Words covered by one completion, and how many completions may be in
+# flight at once
+QUIZ_BATCH_SIZE = 10
+QUIZ_CONCURRENCY = 5
+
+# Sessions whose quiz questions can be prefetched in the background at once
+QUIZ_PREFETCH_WORKERS = 4
+# Letters shown in front of the answer options
+OPTION_LETTERS = string.ascii_uppercase
+
+QUIZ_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "quiz_questions",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "items": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "word": {"type": "string"},
+                            "question": {"type": "string"},
+                            "options": {"type": "array", "items": {"type": "string"}},
+                            "correct": {"type": "integer"},
+                            "explanation": {"type": "string"},
+                        },
+                        "required": [
+                            "word",
+                            "question",
+                            "options",
+                            "correct",
+                            "explanation",
+                        ],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["items"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def _quiz_cache_key(word_data):
+    """Return the result cache key for a word's quiz question."""
+    key = json.dumps(
+        [QUIZ_PROMPT_VERSION, word_data["word"], word_data["translation"]],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
 
-def generate_quiz_question(word_data):
-    """Generate a multiple choice quiz question for a vocabulary word."""
-    prompt = f"""Create a multiple choice quiz question to test knowledge of the German word "{word_data['word']}" 
-    (meaning: {word_data['translation']}).
 
-Create:
+async def stream_quiz_questions_async(client_async, words):
+    """
+    Generate multiple choice quiz questions for several words in one request.
+
+    The instructions are sent once for the whole batch instead of once per
+    word, and each question is yielded as soon as the model completes it.
+
+    Args:
+        client_async: AsyncOpenAI client to send the request with
+        words: Vocabulary dictionaries to build questions for
+
+    Yields:
+        (word, quiz) pairs, where quiz is a dictionary with question,
+        options, correct and explanation; words the model skipped are absent
+    """
+    word_list = "\n".join(
+        f'{i}. "{w["word"]}" (meaning: {w["translation"]})'
+        for i, w in enumerate(words, 1)
+    )
+    prompt = f"""Create a multiple choice quiz question for each of the following German words:
+{word_list}
+
+For each word, create:
 1. A sentence in German with the word missing (use ___ for the blank)
 2. 4 answer options (one correct, three plausible distractors that are similar words)
 3. The index of the correct answer (0-3)
 4. A brief explanation
 
-Return as JSON:
-{{
-  "question": "Ich muss noch die E-Mails ___.",
-  "options": ["beantworten", "antworten", "fragen", "sprechen"],
-  "correct": 0,
-  "explanation": "beantworten is correct because it means to answer/reply to something formally, commonly used with emails."
-}}
+Return as JSON, with one entry per word in "items":
+{{"items": [
+  {{
+    "word": "beantworten",
+    "question": "Ich muss noch die E-Mails ___.",
+    "options": ["beantworten", "antworten", "fragen", "sprechen"],
+    "correct": 0,
+    "explanation": "beantworten is correct because it means to answer/reply to something formally, commonly used with emails."
+  }}
+]}}"""
+
+    stream = await client_async.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {
+                "role": "system",
+                "content": "You are a German language quiz generator.",
+            },
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.7,
+        response_format=QUIZ_RESPONSE_FORMAT,
+        stream=True,
+    )
 
-Return ONLY the JSON, no other text."""
+    parser = JsonItemParser()
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            for item in parser.feed(chunk.choices[0].delta.content):
+                yield item.pop("word"), item
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a German language quiz generator.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.7,
-        )
 
-        content = response.choices[0].message.content.strip()
+def prefetch_quizzes(conn, words, results):
+    """
+    Generate quiz questions for every word up front.
 
-        # Clean JSON
-        if content.startswith("```json"):
-            content = content[7:]
-        if content.startswith("```"):
-            content = content[3:]
-        if content.endswith("```"):
-            content = content[:-3]
+    Words with a question in the result cache are served from it. The rest are
+    split into batches of QUIZ_BATCH_SIZE, one completion each, and the
+    batches are requested concurrently. Each question is put on results as
+    it arrives, so a caller on another thread can start using the first
+    ones while the rest are still being generated.
 
-        return json.loads(content.strip())
+    Runs on a worker thread, so it makes no Streamlit calls and shares no
+    mutable state with the script thread; the result cache connection is
+    opened by the caller.
 
-    except Exception as e:
-        st.error(f"Error generating quiz: {e}")
-        return None
+    Args:
+        conn: Result cache connection from get_cache_db
+        words: Vocabulary dictionaries to build questions for
+        results: queue.Queue that receives (word, quiz dictionary) pairs
 
+    Returns:
+        List of errors from batches that failed while others succeeded; the
+        words of those batches have no question
 
-# ============================================================================
-# STREAMLIT APP
-# ============================================================================
+    Raises:
+        Exception: The first request error, if no question could be produced
+    """
+    produced = set()
+    missing = []
+    for word_data in words:
+        quiz = cache_get(conn, "quiz", _quiz_cache_key(word_data))
+        if quiz is not None:
+            results.put((word_data["word"], quiz))
+            produced.add(word_data["word"])
+        else:
+            missing.append(word_data)
+
+    batches = [
+        missing[i : i + QUIZ_BATCH_SIZE]
+        for i in range(0, len(missing), QUIZ_BATCH_SIZE)
+    ]
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(QUIZ_CONCURRENCY)
+        async with open_async_client() as client_async:
+
+            async def worker(batch):
+                batch_words = {word_data["word"]: word_data for word_data in batch}
+                async with semaphore:
+                    async for word, quiz in stream_quiz_questions_async(
+                        client_async, batch
+                    ):
+                        # Ignore words the model made up or misspelled
+                        if word in batch_words:
+                            results.put((word, quiz))
+                            produced.add(word)
+                            cache_put(
+                                conn, "quiz", _quiz_cache_key(batch_words[word]), quiz
+                            )
+
+            return await asyncio.gather(
+                *(worker(batch) for batch in batches), return_exceptions=True
+            )
 
+    outcomes = asyncio.run(run_all()) if batches else []
+    errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+    if not produced and errors:
+        raise errors[0]
+    return errors
 
-def main():
-    """Main Streamlit app with complete pipeline."""
 
-    # Page configuration
-    st.set_page_config(
-        page_title="German B2 Learning Pipeline", page_icon="🇩🇪", layout="wide"
-    )
+@st.cache_resource
+def get_quiz_executor():
+    """Return the thread pool that runs background quiz prefetches."""
+    return ThreadPoolExecutor(max_workers=QUIZ_PREFETCH_WORKERS)
 
-    # Custom CSS - Enhanced Modern UI
-    st.markdown(
-        """
+
+# ============================================================================
+# STREAMLIT APP
+# ============================================================================
+
+# Initial values of the plain session state keys. The transcript and
+# vocabulary are set through set_transcript and set_vocabulary instead,
+# which also fill in their derived keys.
+SESSION_DEFAULTS = {
+    "quiz_score": 0,
+    "quiz_total": 0,
+    "current_step": 1,
+    "current_quiz": None,
+    "quiz_answered": False,
+    "selected_answer": None,
+}
+
+# Vocabulary cards rendered per page in the Study tab
+VOCAB_PAGE_SIZE = 20
+
+# Characters of an uploaded text file shown in its preview box
+TEXT_PREVIEW_CHARS = 5000
+
+# Custom CSS - Enhanced Modern UI. Emitted on every rerun because Streamlit
+# drops elements a run doesn't redraw.
+APP_CSS = """
         <style>
         /* Import Google Fonts */
         @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700&family=Inter:wght@300;400;500;600&display=swap');
 
+        /* Brand colours, shared by every gradient below */
+        :root {
+            --brand-gradient: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            --brand-gradient-reverse: linear-gradient(135deg, #764ba2 0%, #667eea 100%);
+        }
+
         /* Global Styles */
         html, body, [class*="css"] {
             font-family: 'Inter', sans-serif;
@@ -257,14 +818,9 @@ def main():
             font-family: 'Poppins', sans-serif !important;
         }
 
-        /* Main Container */
-        .main {
-            background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%);
-        }
-
         /* Header Styling */
         .main-header {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            background: var(--brand-gradient);
             padding: 2rem;
             border-radius: 20px;
             margin-bottom: 2rem;
@@ -295,7 +851,8 @@ def main():
             margin: 15px 0;
             border-left: 6px solid #667eea;
             box-shadow: 0 8px 25px rgba(0, 0, 0, 0.1);
-            transition: all 0.3s ease;
+            transition: transform 0.3s ease, box-shadow 0.3s ease,
+                border-left-color 0.3s ease;
             position: relative;
             overflow: hidden;
         }
@@ -320,7 +877,7 @@ def main():
         .word-title {
             font-size: 32px;
             font-weight: 700;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            background: var(--brand-gradient);
             -webkit-background-clip: text;
             -webkit-text-fill-color: transparent;
             background-clip: text;
@@ -338,7 +895,7 @@ def main():
         .pos-badge {
             display: inline-block;
             padding: 5px 15px;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            background: var(--brand-gradient);
             color: white;
             border-radius: 20px;
             font-size: 13px;
@@ -365,27 +922,14 @@ def main():
             font-weight: 600;
         }
 
-        /* Transcript Box */
-        .transcript-box {
-            background: linear-gradient(135deg, #ffffff 0%, #f8f9ff 100%);
-            padding: 30px;
-            border-radius: 15px;
-            border: 2px solid #e5e7eb;
-            margin: 25px 0;
-            box-shadow: 0 8px 25px rgba(0, 0, 0, 0.08);
-            line-height: 1.8;
-            font-size: 16px;
-            color: #374151;
-        }
-
         /* Metric Cards */
         .metric-card {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            background: var(--brand-gradient);
             padding: 25px;
             border-radius: 15px;
             text-align: center;
             box-shadow: 0 8px 25px rgba(102, 126, 234, 0.25);
-            transition: all 0.3s ease;
+            transition: transform 0.3s ease, box-shadow 0.3s ease;
             position: relative;
             overflow: hidden;
         }
@@ -422,31 +966,36 @@ def main():
             letter-spacing: 1px;
         }
 
+        .metric-row {
+            display: flex;
+            gap: 1rem;
+        }
+
+        .metric-row .metric-card {
+            flex: 1;
+        }
+
         /* Buttons */
         .stButton>button {
             width: 100%;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            background: var(--brand-gradient);
             color: white;
             border: none;
             padding: 12px 24px;
             border-radius: 10px;
             font-weight: 600;
             font-size: 16px;
-            transition: all 0.3s ease;
+            transition: transform 0.3s ease, box-shadow 0.3s ease;
             box-shadow: 0 4px 15px rgba(102, 126, 234, 0.3);
         }
 
         .stButton>button:hover {
             transform: translateY(-2px);
             box-shadow: 0 6px 25px rgba(102, 126, 234, 0.4);
-            background: linear-gradient(135deg, #764ba2 0%, #667eea 100%);
+            background: var(--brand-gradient-reverse);
         }
 
         /* Sidebar */
-        [data-testid="stSidebar"] {
-            background: linear-gradient(180deg, #f8f9ff 0%, #e0e7ff 100%);
-        }
-
         [data-testid="stSidebar"] [data-testid="stMarkdownContainer"] h1,
         [data-testid="stSidebar"] [data-testid="stMarkdownContainer"] h2,
         [data-testid="stSidebar"] [data-testid="stMarkdownContainer"] h3 {
@@ -466,7 +1015,7 @@ def main():
         }
 
         .step-active {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            background: var(--brand-gradient);
             color: white;
             padding: 12px;
             border-radius: 10px;
@@ -505,7 +1054,7 @@ def main():
             color: #667eea;
             font-weight: 600;
             padding: 12px 24px;
-            transition: all 0.3s ease;
+            transition: background-color 0.3s ease;
         }
 
         .stTabs [data-baseweb="tab"]:hover {
@@ -513,28 +1062,11 @@ def main():
         }
 
         .stTabs [aria-selected="true"] {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            background: var(--brand-gradient);
             color: white !important;
             box-shadow: 0 4px 15px rgba(102, 126, 234, 0.3);
         }
 
-        /* Quiz Options */
-        .quiz-option {
-            background: linear-gradient(135deg, #ffffff 0%, #f8f9ff 100%);
-            padding: 20px;
-            border-radius: 12px;
-            margin: 10px 0;
-            border: 2px solid #e5e7eb;
-            transition: all 0.3s ease;
-            cursor: pointer;
-        }
-
-        .quiz-option:hover {
-            border-color: #667eea;
-            background: linear-gradient(135deg, #f8f9ff 0%, #e0e7ff 100%);
-            transform: translateX(5px);
-        }
-
         /* Info/Warning/Error boxes */
         .stAlert {
             border-radius: 12px;
@@ -557,24 +1089,12 @@ def main():
             border: 2px solid #e5e7eb;
             font-size: 16px;
             padding: 15px;
-            transition: all 0.3s ease;
-        }
-
-        .stTextArea textarea:focus {
-            border-color: #667eea;
-            box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
         }
 
         /* Select Box */
         .stSelectbox > div > div {
             border-radius: 10px;
             border: 2px solid #e5e7eb;
-            transition: all 0.3s ease;
-        }
-
-        .stSelectbox > div > div:focus-within {
-            border-color: #667eea;
-            box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
         }
 
         /* Metrics */
@@ -584,12 +1104,23 @@ def main():
             color: #667eea;
         }
 
-        /* Expander */
-        .streamlit-expanderHeader {
+        /* B2 relevance note under a card */
+        .relevance {
+            margin: 0 0 15px 0;
+        }
+
+        .relevance summary {
             background: linear-gradient(135deg, #f8f9ff 0%, #e0e7ff 100%);
             border-radius: 10px;
+            padding: 10px 15px;
             font-weight: 600;
             color: #667eea;
+            cursor: pointer;
+        }
+
+        .relevance p {
+            padding: 10px 15px;
+            margin: 0;
         }
 
         /* Audio Player */
@@ -598,14 +1129,9 @@ def main():
             border-radius: 10px;
         }
 
-        /* Spinner */
-        .stSpinner > div {
-            border-top-color: #667eea !important;
-        }
-
         /* Section Headers */
         .section-header {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            background: var(--brand-gradient);
             color: white;
             padding: 15px 25px;
             border-radius: 12px;
@@ -634,16 +1160,6 @@ def main():
             line-height: 1.6;
         }
 
-        /* Success Box */
-        .success-box {
-            background: linear-gradient(135deg, #d1fae5 0%, #a7f3d0 100%);
-            border-left: 5px solid #10b981;
-            padding: 20px;
-            border-radius: 12px;
-            margin: 15px 0;
-            box-shadow: 0 4px 15px rgba(16, 185, 129, 0.15);
-        }
-
         /* Quiz Question Box */
         .quiz-question {
             background: linear-gradient(135deg, #ffffff 0%, #f8f9ff 100%);
@@ -666,16 +1182,6 @@ def main():
             box-shadow: 0 4px 15px rgba(0, 0, 0, 0.05);
         }
 
-        /* File Info Box */
-        .file-info {
-            background: linear-gradient(135deg, #f8f9ff 0%, #e0e7ff 100%);
-            padding: 20px;
-            border-radius: 12px;
-            margin: 15px 0;
-            border: 2px solid #e5e7eb;
-            box-shadow: 0 4px 15px rgba(0, 0, 0, 0.05);
-        }
-
         /* Download Button */
         .stDownloadButton>button {
             background: linear-gradient(135deg, #10b981 0%, #059669 100%);
@@ -685,7 +1191,7 @@ def main():
             border-radius: 10px;
             font-weight: 600;
             font-size: 16px;
-            transition: all 0.3s ease;
+            transition: transform 0.3s ease, box-shadow 0.3s ease;
             box-shadow: 0 4px 15px rgba(16, 185, 129, 0.3);
         }
 
@@ -715,476 +1221,758 @@ def main():
         }
 
         ::-webkit-scrollbar-thumb {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            background: var(--brand-gradient);
             border-radius: 10px;
         }
 
         ::-webkit-scrollbar-thumb:hover {
-            background: linear-gradient(135deg, #764ba2 0%, #667eea 100%);
+            background: var(--brand-gradient-reverse);
         }
         </style>
-    """,
-        unsafe_allow_html=True,
-    )
+    """
 
-    # Header with modern design
-    st.markdown(
-        """
+# Static HTML fragments, identical on every rerun
+HEADER_HTML = """
         <div class="main-header">
             <h1 class="main-title">🇩🇪 German B2 Learning Pipeline</h1>
             <p class="main-subtitle">Audio → Transcription → Vocabulary → Interactive Learning</p>
         </div>
-    """,
-        unsafe_allow_html=True,
+    """
+
+UPLOAD_INFO_HTML = '<div class="info-box"><p>📁 Supported formats: MP3, WAV, M4A, MPEG, MP4, WEBM (max 25MB)</p></div>'
+
+STEP1_HEADER_HTML = '<div class="section-header">🎤 Step 1: Provide German Audio or Text</div>'
+STEP2_HEADER_HTML = '<div class="section-header">📚 Step 2: Study Vocabulary</div>'
+STEP3_HEADER_HTML = '<div class="section-header">🎯 Step 3: Test Your Knowledge</div>'
+QUIZ_HEADER_HTML = '<div class="section-header">📝 Complete the Sentence</div>'
+
+# Vocabulary card fragments, filled in per word. They are kept flush left
+# with no blank lines: Streamlit's markdown would render a line indented
+# after a blank one as a code block.
+VOCAB_CARD_TEMPLATE = """<div class="vocab-card">
+    <div class="word-title">
+        {idx}. {article_text}{word}
+    </div>
+    <div class="translation">
+        {translation}
+    </div>
+    <span class="pos-badge">{pos}</span>
+</div>"""
+
+VOCAB_EXAMPLE_TEMPLATE = """<div class="example">
+    <strong>📝 Example:</strong><br>
+    {example}
+</div>"""
+
+VOCAB_RELEVANCE_TEMPLATE = """<details class="relevance">
+    <summary>ℹ️ Why is this B2-relevant?</summary>
+    <p>{b2_relevance}</p>
+</details>"""
+
+
+# Sort keys for the Study tab's "Sort by" options; other options keep the
+# extraction order
+VOCAB_SORT_KEYS = {
+    "Alphabetical": operator.itemgetter("word"),
+    "Part of speech": operator.itemgetter("pos", "word"),
+}
+
+
+def filter_sort_vocabulary(vocabulary, pos_filter, sort_by):
+    """
+    Filter vocabulary by part of speech and sort it for display.
+
+    Args:
+        vocabulary: List of vocabulary dictionaries
+        pos_filter: Parts of speech to keep
+        sort_by: "Original order", "Alphabetical" or "Part of speech"
+
+    Returns:
+        Filtered and sorted list of vocabulary dictionaries
+    """
+    allowed = frozenset(pos_filter)
+    filtered_vocab = (v for v in vocabulary if v["pos"] in allowed)
+
+    # sorted() consumes the generator directly, so sorting doesn't copy an
+    # intermediate filtered list
+    sort_key = VOCAB_SORT_KEYS.get(sort_by)
+    if sort_key:
+        return sorted(filtered_vocab, key=sort_key)
+    return list(filtered_vocab)
+
+
+def vocab_card_html(page_vocab, first_idx):
+    """
+    Build the card HTML for one page of vocabulary.
+
+    The whole page goes out as a single markdown element. The B2 relevance
+    note is a <details> block inside the HTML rather than an st.expander, so
+    it doesn't cost an extra element per card.
+
+    Args:
+        page_vocab: Vocabulary dictionaries on the current page
+        first_idx: Display number of the first card
+
+    Returns:
+        HTML string for all cards on the page
+    """
+    parts = []
+    for idx, word_data in enumerate(page_vocab, first_idx):
+        article = word_data.get("article")
+        article_text = f"{article} " if article else ""
+        parts.append(
+            VOCAB_CARD_TEMPLATE.format(idx=idx, article_text=article_text, **word_data)
+        )
+
+        if word_data.get("example"):
+            parts.append(VOCAB_EXAMPLE_TEMPLATE.format_map(word_data))
+
+        if word_data.get("b2_relevance"):
+            parts.append(VOCAB_RELEVANCE_TEMPLATE.format_map(word_data))
+
+    return "\n".join(parts)
+
+
+def vocabulary_to_csv(vocabulary):
+    """
+    Serialize vocabulary to CSV text.
+
+    Args:
+        vocabulary: List of vocabulary dictionaries
+
+    Returns:
+        CSV text with a header row
+    """
+    fieldnames = list(dict.fromkeys(key for v in vocabulary for key in v))
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    writer.writeheader()
+    writer.writerows(vocabulary)
+    return buffer.getvalue()
+
+
+def decode_text_file(uploaded_file):
+    """
+    Decode an uploaded text file, once per upload.
+
+    Args:
+        uploaded_file: Streamlit uploaded file object
+
+    Returns:
+        File content as text
+    """
+    if st.session_state.get("uploaded_text_id") != uploaded_file.file_id:
+        st.session_state.uploaded_text = uploaded_file.getvalue().decode("utf-8")
+        st.session_state.uploaded_text_id = uploaded_file.file_id
+    return st.session_state.uploaded_text
+
+
+def render_metric_row(metrics):
+    """
+    Render metric cards side by side as a single markdown element.
+
+    Args:
+        metrics: List of (value, label) pairs, in display order
+    """
+    metric_cards = "".join(
+        f'<div class="metric-card"><h3>{value}</h3><p>{label}</p></div>'
+        for value, label in metrics
     )
+    st.markdown(f'<div class="metric-row">{metric_cards}</div>', unsafe_allow_html=True)
 
-    # Initialize session state
-    if "transcript" not in st.session_state:
-        st.session_state.transcript = ""
-    if "vocabulary" not in st.session_state:
-        st.session_state.vocabulary = []
-    if "quiz_score" not in st.session_state:
-        st.session_state.quiz_score = 0
-    if "quiz_total" not in st.session_state:
-        st.session_state.quiz_total = 0
-    if "current_step" not in st.session_state:
-        st.session_state.current_step = 1
 
-    # Sidebar - Progress tracker
-    with st.sidebar:
-        st.markdown("## 📊 Pipeline Progress")
+def set_transcript(text):
+    """
+    Store a new transcript in session state with its derived display data.
 
-        # Progress indicators with custom styling
-        steps = {
-            1: "🎤 Audio Input",
-            2: "📝 Transcription",
-            3: "📚 Vocabulary",
-            4: "🎯 Learning",
-        }
+    The paragraph split and word count are done once here rather than on
+    every rerun.
 
-        for step_num, step_name in steps.items():
-            if step_num < st.session_state.current_step:
-                st.markdown(
-                    f'<div class="step-success">✅ {step_name}</div>',
-                    unsafe_allow_html=True,
-                )
-            elif step_num == st.session_state.current_step:
-                st.markdown(
-                    f'<div class="step-active">▶️ {step_name}</div>',
-                    unsafe_allow_html=True,
-                )
-            else:
-                st.markdown(
-                    f'<div class="step-pending">⏸️ {step_name}</div>',
-                    unsafe_allow_html=True,
-                )
+    Args:
+        text: Transcript text, or "" to clear it
+    """
+    st.session_state.transcript = text
+    st.session_state.transcript_blocks = [
+        block.strip() for block in text.split("\n\n") if block.strip()
+    ]
+    st.session_state.transcript_word_count = len(text.split())
 
-        st.markdown("---")
 
-        # Statistics
-        if st.session_state.transcript:
-            st.metric("Words in Transcript", len(st.session_state.transcript.split()))
+def set_vocabulary(vocabulary):
+    """
+    Store extracted vocabulary in session state with its part-of-speech counts.
 
-        if st.session_state.vocabulary:
-            st.metric("Vocabulary Count", len(st.session_state.vocabulary))
+    The rows stay the source of truth for cards, quiz and export. The Study
+    tab's metrics and filter options only need how often each part of speech
+    occurs, in first-seen order, so that is counted once here instead of
+    from every row on every rerun. The CSV export is built here for the
+    same reason.
 
-        if st.session_state.quiz_total > 0:
-            accuracy = (st.session_state.quiz_score / st.session_state.quiz_total) * 100
-            st.metric("Quiz Accuracy", f"{accuracy:.1f}%")
+    Args:
+        vocabulary: List of vocabulary dictionaries
+    """
+    st.session_state.vocabulary = vocabulary
+    st.session_state.vocabulary_pos_counts = Counter(v["pos"] for v in vocabulary)
+    st.session_state.vocabulary_csv = vocabulary_to_csv(vocabulary)
+
+    # Generated questions belong to the previous vocabulary, and so does
+    # the one on screen. A prefetch still running for it finishes unobserved.
+    st.session_state.all_quizzes = {}
+    st.session_state.quiz_idx = -1
+    st.session_state.quiz_future = None
+    st.session_state.quiz_queue = None
+    st.session_state.current_quiz = None
+    st.session_state.quiz_answered = False
+    st.session_state.selected_answer = None
+
+
+def start_quiz_prefetch(vocabulary):
+    """
+    Start generating quiz questions for vocabulary on a background thread.
 
-        st.markdown("---")
+    The page stays interactive meanwhile. The thread hands questions back
+    through st.session_state.quiz_queue as they arrive, and
+    collect_quiz_prefetch moves them into all_quizzes and reports how the
+    prefetch ended.
 
-        if st.button("🔄 Reset Pipeline"):
-            st.session_state.transcript = ""
-            st.session_state.vocabulary = []
-            st.session_state.quiz_score = 0
-            st.session_state.quiz_total = 0
-            st.session_state.current_step = 1
-            st.rerun()
+    Args:
+        vocabulary: List of vocabulary dictionaries
+    """
+    st.session_state.all_quizzes = {}
+    st.session_state.quiz_queue = queue.Queue()
+    st.session_state.quiz_future = get_quiz_executor().submit(
+        prefetch_quizzes,
+        get_cache_db(),
+        list(vocabulary),
+        st.session_state.quiz_queue,
+    )
 
-    # Main content
-    tabs = st.tabs(["🎤 Step 1: Audio Input", "📚 Step 2: Study", "🎯 Step 3: Quiz"])
 
-    # ========================================================================
-    # TAB 1: AUDIO INPUT & TRANSCRIPTION
-    # ========================================================================
-    with tabs[0]:
-        st.markdown('<div class="section-header">🎤 Step 1: Provide German Audio or Text</div>', unsafe_allow_html=True)
+def receive_prefetched_quizzes():
+    """Move questions the background prefetch has queued into all_quizzes."""
+    results = st.session_state.quiz_queue
+    if results is None:
+        return
+    while True:
+        try:
+            word, quiz = results.get_nowait()
+        except queue.Empty:
+            return
+        st.session_state.all_quizzes[word] = quiz
 
-        input_method = st.radio(
-            "Choose input method:",
-            ["Upload Audio File", "Paste Text", "Load from File"],
+
+def collect_quiz_prefetch():
+    """
+    Take in new prefetched questions and clear a finished prefetch.
+
+    Shows the error if the prefetch failed, and a warning if only some of
+    its requests did.
+    """
+    future = st.session_state.quiz_future
+    # Checked before draining, so nothing queued after the drain is lost
+    done = future is not None and future.done()
+    receive_prefetched_quizzes()
+    if not done:
+        return
+
+    st.session_state.quiz_future = None
+    st.session_state.quiz_queue = None
+    try:
+        errors = future.result()
+    except Exception as e:
+        st.error(f"Error generating quiz: {e}")
+        return
+    if errors:
+        missing = len(st.session_state.vocabulary) - len(st.session_state.all_quizzes)
+        st.warning(
+            f"⚠️ {len(errors)} quiz requests failed, so {missing} words have no "
+            f"question: {errors[0]}"
         )
 
-        if input_method == "Upload Audio File":
-            st.markdown("#### 🎤 Upload Audio File")
-            st.markdown('<div class="info-box"><p>📁 Supported formats: MP3, WAV, M4A, MPEG, MP4, WEBM (max 25MB)</p></div>', unsafe_allow_html=True)
 
-            uploaded_audio = st.file_uploader(
-                "Choose an audio file",
-                type=["mp3", "wav", "m4a", "mpeg", "mp4", "webm"],
-            )
+def show_next_quiz():
+    """
+    Move on to the next prefetched quiz question.
 
-            if uploaded_audio:
-                st.audio(uploaded_audio)
-
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    st.write(f"**File:** {uploaded_audio.name}")
-                    st.write(f"**Size:** {uploaded_audio.size / 1024:.2f} KB")
-
-                with col2:
-                    if st.button("🎙️ Transcribe", type="primary"):
-                        if uploaded_audio.size > 25 * 1024 * 1024:
-                            st.error("File too large! Maximum size is 25MB.")
-                        else:
-                            with st.spinner(
-                                "Transcribing audio... This may take a moment."
-                            ):
-                                transcript = transcribe_uploaded_audio(uploaded_audio)
-
-                                if transcript:
-                                    st.session_state.transcript = transcript
-                                    st.session_state.current_step = 2
-                                    st.success("✅ Transcription complete!")
-                                    st.rerun()
-
-        elif input_method == "Paste Text":
-            st.markdown("#### 📝 Paste German Text")
-
-            text_input = st.text_area(
-                "Paste your German text here:",
-                height=200,
-                placeholder="Ich habe also die Mails beantwortet, solange die Kinder noch geschlafen haben...",
-            )
+    Used as a button callback, so the click's own rerun already shows the
+    new question. Questions are generated for the whole vocabulary at once,
+    so picking one is a list lookup, and stepping through them in order
+    covers every word before any repeats.
+    """
+    if not st.session_state.all_quizzes:
+        # Retry a failed prefetch only when asked to, so an error doesn't
+        # restart it on every rerun
+        if st.session_state.quiz_future is None:
+            start_quiz_prefetch(st.session_state.vocabulary)
+        return
+
+    quizzes = list(st.session_state.all_quizzes.values())
+    st.session_state.quiz_idx = (st.session_state.quiz_idx + 1) % len(quizzes)
+    quiz = quizzes[st.session_state.quiz_idx]
+    st.session_state.current_quiz = quiz
+    # Formatted once per question rather than on every rerun that draws it
+    st.session_state.quiz_labels = tuple(
+        f"{letter}. {option}" for letter, option in zip(OPTION_LETTERS, quiz["options"])
+    )
+    st.session_state.quiz_answered = False
+    st.session_state.selected_answer = None
 
-            if st.button("✅ Use This Text", type="primary"):
-                if text_input.strip():
-                    st.session_state.transcript = text_input.strip()
-                    st.session_state.current_step = 2
-                    st.success("✅ Text loaded!")
-                    st.rerun()
-                else:
-                    st.error("Please enter some text!")
 
-        else:  # Load from File
-            st.markdown("#### 📁 Load Text from File")
+@st.fragment(run_every=1)
+def quiz_prefetch_status():
+    """
+    Show that questions are being prepared.
 
-            uploaded_text = st.file_uploader("Choose a text file", type=["txt"])
+    Reruns the app once the first question arrives, so the quiz can start,
+    and again when the prefetch finishes.
+    """
+    receive_prefetched_quizzes()
+    future = st.session_state.quiz_future
+    if (
+        future is None
+        or future.done()
+        or (st.session_state.all_quizzes and st.session_state.current_quiz is None)
+    ):
+        st.rerun()
+    st.info(
+        f"⏳ Preparing quiz questions in the background... "
+        f"{len(st.session_state.all_quizzes)} of "
+        f"{len(st.session_state.vocabulary)} ready."
+    )
 
-            if uploaded_text:
-                text_content = uploaded_text.read().decode("utf-8")
-                st.text_area("File content:", text_content, height=200)
 
-                if st.button("✅ Use This File", type="primary"):
-                    st.session_state.transcript = text_content
-                    st.session_state.current_step = 2
-                    st.success("✅ File loaded!")
-                    st.rerun()
+# ============================================================================
+# TAB 1: AUDIO INPUT & TRANSCRIPTION
+# ============================================================================
 
-        # Display current transcript
-        if st.session_state.transcript:
-            st.markdown("---")
-            st.markdown("#### 📄 Current Transcript")
-
-            st.markdown(
-                f"""
-                <div class="transcript-box">
-                    {st.session_state.transcript}
-                </div>
-            """,
-                unsafe_allow_html=True,
-            )
 
-            # Extract vocabulary button
-            if not st.session_state.vocabulary:
-                if st.button("📚 Extract B2 Vocabulary", type="primary"):
-                    with st.spinner("Analyzing text and extracting vocabulary..."):
-                        vocabulary = extract_b2_vocabulary(st.session_state.transcript)
-                        st.session_state.vocabulary = vocabulary
-                        st.session_state.current_step = 3
-
-                    if vocabulary:
-                        st.success(f"✅ Extracted {len(vocabulary)} B2-level words!")
-                        st.balloons()
+# Each tab body is a fragment, so its widgets rerun only that tab instead of
+# the whole page. Actions that change what other tabs or the sidebar show
+# call st.rerun(), which reruns the full app.
+@st.fragment
+def audio_input_tab():
+    """Step 1: take audio or text and turn it into the transcript."""
+    st.markdown(STEP1_HEADER_HTML, unsafe_allow_html=True)
+
+    input_method = st.radio(
+        "Choose input method:",
+        ["Upload Audio File", "Paste Text", "Load from File"],
+    )
+
+    if input_method == "Upload Audio File":
+        st.markdown("#### 🎤 Upload Audio File")
+        st.markdown(UPLOAD_INFO_HTML, unsafe_allow_html=True)
+
+        uploaded_audio = st.file_uploader(
+            "Choose an audio file",
+            type=["mp3", "wav", "m4a", "mpeg", "mp4", "webm"],
+        )
+
+        if uploaded_audio:
+            st.audio(uploaded_audio)
+
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.write(f"**File:** {uploaded_audio.name}")
+                st.write(f"**Size:** {uploaded_audio.size / 1024:.2f} KB")
+
+            with col2:
+                transcribe_clicked = st.button("🎙️ Transcribe", type="primary")
+
+            # Run outside the narrow column so the streamed transcript
+            # renders full width
+            if transcribe_clicked:
+                # The 25MB limit is the API's; the local engine has none
+                if (
+                    st.session_state.engine == "cloud"
+                    and uploaded_audio.size > 25 * 1024 * 1024
+                ):
+                    st.error("File too large! Maximum size is 25MB.")
+                else:
+                    with st.spinner("Transcribing audio..."):
+                        transcript = transcribe_uploaded_audio(
+                            uploaded_audio, st.session_state.engine
+                        )
+
+                    if transcript:
+                        set_transcript(transcript)
+                        st.session_state.current_step = 2
+                        st.success("✅ Transcription complete!")
                         st.rerun()
+
+    elif input_method == "Paste Text":
+        st.markdown("#### 📝 Paste German Text")
+
+        text_input = st.text_area(
+            "Paste your German text here:",
+            height=200,
+            placeholder="Ich habe also die Mails beantwortet, solange die Kinder noch geschlafen haben...",
+        )
+
+        if st.button("✅ Use This Text", type="primary"):
+            if text_input.strip():
+                set_transcript(text_input.strip())
+                st.session_state.current_step = 2
+                st.success("✅ Text loaded!")
+                st.rerun()
             else:
-                st.success(
-                    f"✅ {len(st.session_state.vocabulary)} vocabulary words ready!"
+                st.error("Please enter some text!")
+
+    else:  # Load from File
+        st.markdown("#### 📁 Load Text from File")
+
+        uploaded_text = st.file_uploader("Choose a text file", type=["txt"])
+
+        if uploaded_text:
+            text_content = decode_text_file(uploaded_text)
+            st.text_area(
+                "File content:", text_content[:TEXT_PREVIEW_CHARS], height=200
+            )
+            if len(text_content) > TEXT_PREVIEW_CHARS:
+                st.caption(
+                    f"Showing the first {TEXT_PREVIEW_CHARS:,} of "
+                    f"{len(text_content):,} characters."
                 )
-                st.info("👉 Go to the 'Study' tab to review vocabulary")
 
-    # ========================================================================
-    # TAB 2: STUDY VOCABULARY
-    # ========================================================================
-    with tabs[1]:
-        st.markdown('<div class="section-header">📚 Step 2: Study Vocabulary</div>', unsafe_allow_html=True)
+            if st.button("✅ Use This File", type="primary"):
+                set_transcript(text_content)
+                st.session_state.current_step = 2
+                st.success("✅ File loaded!")
+                st.rerun()
 
+    # Display current transcript
+    if st.session_state.transcript:
+        st.markdown("---")
+        st.markdown("#### 📄 Current Transcript")
+
+        # Plain text blocks skip the markdown/HTML pipeline entirely
+        with st.container(border=True):
+            for block in st.session_state.transcript_blocks:
+                st.text(block)
+
+        # Extract vocabulary button
         if not st.session_state.vocabulary:
-            st.warning("⚠️ No vocabulary available yet!")
-            st.info("Please provide audio or text in Step 1, then extract vocabulary.")
+            if st.button("📚 Extract B2 Vocabulary", type="primary"):
+                with st.spinner("Analyzing text and extracting vocabulary..."):
+                    vocabulary = extract_b2_vocabulary(st.session_state.transcript)
+                    set_vocabulary(vocabulary)
+                    st.session_state.current_step = 3
+
+                if vocabulary:
+                    start_quiz_prefetch(vocabulary)
+                    st.success(f"✅ Extracted {len(vocabulary)} B2-level words!")
+                    st.rerun()
         else:
-            # Summary metrics
-            col1, col2, col3, col4 = st.columns(4)
+            st.success(
+                f"✅ {len(st.session_state.vocabulary)} vocabulary words ready!"
+            )
+            st.info("👉 Go to the 'Study' tab to review vocabulary")
 
-            with col1:
-                st.markdown(
-                    f"""
-                    <div class="metric-card">
-                        <h3>{len(st.session_state.vocabulary)}</h3>
-                        <p>Total Words</p>
-                    </div>
-                """,
-                    unsafe_allow_html=True,
-                )
 
-            with col2:
-                nouns = len(
-                    [v for v in st.session_state.vocabulary if v["pos"] == "noun"]
-                )
-                st.markdown(
-                    f"""
-                    <div class="metric-card">
-                        <h3>{nouns}</h3>
-                        <p>Nouns</p>
-                    </div>
-                """,
-                    unsafe_allow_html=True,
-                )
+# ============================================================================
+# TAB 2: STUDY VOCABULARY
+# ============================================================================
 
-            with col3:
-                verbs = len(
-                    [v for v in st.session_state.vocabulary if v["pos"] == "verb"]
-                )
-                st.markdown(
-                    f"""
-                    <div class="metric-card">
-                        <h3>{verbs}</h3>
-                        <p>Verbs</p>
-                    </div>
-                """,
-                    unsafe_allow_html=True,
-                )
 
-            with col4:
-                others = len(st.session_state.vocabulary) - nouns - verbs
-                st.markdown(
-                    f"""
-                    <div class="metric-card">
-                        <h3>{others}</h3>
-                        <p>Other</p>
-                    </div>
-                """,
-                    unsafe_allow_html=True,
-                )
+@st.fragment
+def study_tab():
+    """Step 2: browse, filter and export the extracted vocabulary."""
+    st.markdown(STEP2_HEADER_HTML, unsafe_allow_html=True)
+
+    if not st.session_state.vocabulary:
+        st.warning("⚠️ No vocabulary available yet!")
+        st.info("Please provide audio or text in Step 1, then extract vocabulary.")
+    else:
+        # Summary metrics, from counts taken once per vocabulary
+        pos_counts = st.session_state.vocabulary_pos_counts
+        total = len(st.session_state.vocabulary)
+        nouns = pos_counts["noun"]
+        verbs = pos_counts["verb"]
+        metrics = [
+            (total, "Total Words"),
+            (nouns, "Nouns"),
+            (verbs, "Verbs"),
+            (total - nouns - verbs, "Other"),
+        ]
+        render_metric_row(metrics)
 
-            st.markdown("---")
+        st.markdown("---")
 
-            # Filter and sort options
+        # Filter and sort options, applied together on submit so that
+        # editing them doesn't rerun the whole app per change
+        with st.form("vocab_filters", border=False):
             col1, col2 = st.columns(2)
             with col1:
-                all_pos = list(set([v["pos"] for v in st.session_state.vocabulary]))
+                # Counter keeps first-seen order, so its keys are the
+                # distinct parts of speech in vocabulary order
+                all_pos = list(pos_counts)
                 filter_pos = st.multiselect(
                     "Filter by part of speech:", options=all_pos, default=all_pos
                 )
 
             with col2:
                 sort_by = st.selectbox(
-                    "Sort by:", ["Original order", "Alphabetical", "Part of speech"]
+                    "Sort by:",
+                    ["Original order", "Alphabetical", "Part of speech"],
                 )
 
-            # Filter and sort vocabulary
-            filtered_vocab = [
-                v for v in st.session_state.vocabulary if v["pos"] in filter_pos
-            ]
+            st.form_submit_button("Apply")
 
-            if sort_by == "Alphabetical":
-                filtered_vocab = sorted(filtered_vocab, key=lambda x: x["word"])
-            elif sort_by == "Part of speech":
-                filtered_vocab = sorted(
-                    filtered_vocab, key=lambda x: (x["pos"], x["word"])
-                )
+        # Filter and sort vocabulary
+        filtered_vocab = filter_sort_vocabulary(
+            st.session_state.vocabulary, filter_pos, sort_by
+        )
 
-            st.markdown("---")
+        st.markdown("---")
 
-            # Display vocabulary cards
-            for idx, word_data in enumerate(filtered_vocab, 1):
-                article_text = (
-                    f"{word_data.get('article', '')} "
-                    if word_data.get("article")
-                    else ""
-                )
+        # Only one page of cards is rendered per run
+        num_pages = max(1, math.ceil(len(filtered_vocab) / VOCAB_PAGE_SIZE))
+        page = 1
+        if num_pages > 1:
+            page = st.number_input(
+                f"Page (1-{num_pages})",
+                min_value=1,
+                max_value=num_pages,
+                value=1,
+                step=1,
+            )
+        page_start = (page - 1) * VOCAB_PAGE_SIZE
+        page_vocab = filtered_vocab[page_start : page_start + VOCAB_PAGE_SIZE]
+
+        # Display vocabulary cards
+        st.markdown(
+            vocab_card_html(page_vocab, page_start + 1), unsafe_allow_html=True
+        )
+
+        # Export option
+        st.markdown("---")
+        col1, col2 = st.columns(2)
+
+        with col1:
+            # One click downloads; the CSV text is built once per vocabulary
+            st.download_button(
+                label="📥 Export to CSV",
+                data=st.session_state.vocabulary_csv,
+                file_name="german_b2_vocabulary.csv",
+                mime="text/csv",
+            )
+
+        with col2:
+            if st.button("🎯 Ready for Quiz!"):
+                st.session_state.current_step = 4
+                st.success("✅ Moving to quiz mode!")
+                st.rerun()
 
-                st.markdown(
-                    f"""
-                    <div class="vocab-card">
-                        <div class="word-title">
-                            {idx}. {article_text}{word_data['word']}
-                        </div>
-                        <div class="translation">
-                            {word_data['translation']}
-                        </div>
-                        <span class="pos-badge">{word_data['pos']}</span>
-                    </div>
-                """,
-                    unsafe_allow_html=True,
+
+# ============================================================================
+# TAB 3: QUIZ MODE
+# ============================================================================
+
+
+@st.fragment
+def quiz_tab():
+    """Step 3: multiple choice questions on the vocabulary."""
+    st.markdown(STEP3_HEADER_HTML, unsafe_allow_html=True)
+
+    if not st.session_state.vocabulary:
+        st.warning("⚠️ No vocabulary available for quiz!")
+        st.info("Please complete Steps 1 and 2 first.")
+    else:
+        # Score display
+        render_metric_row(
+            [
+                (st.session_state.quiz_score, "✅ Correct"),
+                (st.session_state.quiz_total, "📊 Total"),
+                (st.session_state.quiz_accuracy_text, "🎯 Accuracy"),
+            ]
+        )
+
+        st.markdown("---")
+
+        collect_quiz_prefetch()
+
+        # Generate new question
+        col1, col2 = st.columns([3, 1])
+
+        with col1:
+            st.button("🎲 New Question", type="primary", on_click=show_next_quiz)
+
+        with col2:
+            if st.button("🔄 Reset Score"):
+                st.session_state.quiz_score = 0
+                st.session_state.quiz_total = 0
+                st.rerun()
+
+        # Start on the first question as soon as one is ready. This has to
+        # come before the status fragment, which reruns the app while a
+        # ready question is still unpicked
+        if st.session_state.current_quiz is None and st.session_state.all_quizzes:
+            show_next_quiz()
+
+        if st.session_state.quiz_future is not None:
+            quiz_prefetch_status()
+
+        # Display quiz question
+        if st.session_state.current_quiz:
+            quiz = st.session_state.current_quiz
+            answered = st.session_state.quiz_answered
+            correct_idx = quiz["correct"]
+
+            st.markdown(QUIZ_HEADER_HTML, unsafe_allow_html=True)
+            st.markdown(f'<div class="quiz-question">{quiz["question"]}</div>', unsafe_allow_html=True)
+
+            st.markdown("")
+
+            # Answer options in a form, so picking an option doesn't
+            # rerun anything until the answer is submitted
+            with st.form("quiz_form", border=False):
+                choice = st.radio(
+                    "Choose your answer:",
+                    range(len(quiz["options"])),
+                    format_func=st.session_state.quiz_labels.__getitem__,
+                    index=None,
+                    # Keyed per question so a new one starts unselected
+                    key=f"quiz_choice_{quiz['question']}",
+                    disabled=answered,
+                )
+                submitted = st.form_submit_button(
+                    "Submit",
+                    type="primary",
+                    disabled=answered,
+                    use_container_width=True,
                 )
 
-                if word_data.get("example"):
-                    st.markdown(
-                        f"""
-                        <div class="example">
-                            <strong>📝 Example:</strong><br>
-                            {word_data['example']}
-                        </div>
-                    """,
-                        unsafe_allow_html=True,
-                    )
+            if submitted:
+                if choice is None:
+                    st.warning("Please choose an answer first.")
+                else:
+                    st.session_state.selected_answer = choice
+                    st.session_state.quiz_answered = True
+                    st.session_state.quiz_total += 1
 
-                if word_data.get("b2_relevance"):
-                    with st.expander("ℹ️ Why is this B2-relevant?"):
-                        st.write(word_data["b2_relevance"])
+                    if choice == correct_idx:
+                        st.session_state.quiz_score += 1
 
-                st.markdown("")
+                    st.rerun()
 
-            # Export option
-            st.markdown("---")
-            col1, col2 = st.columns(2)
+            # Show result
+            if answered:
+                st.markdown("---")
 
-            with col1:
-                if st.button("📥 Export to CSV"):
-                    import pandas as pd
-
-                    df = pd.DataFrame(st.session_state.vocabulary)
-                    csv = df.to_csv(index=False)
-                    st.download_button(
-                        label="⬇️ Download CSV",
-                        data=csv,
-                        file_name="german_b2_vocabulary.csv",
-                        mime="text/csv",
+                if st.session_state.selected_answer == correct_idx:
+                    st.success("🎉 **Correct!** Well done!")
+                else:
+                    st.error(
+                        f"❌ **Wrong!** The correct answer is: **{quiz['options'][correct_idx]}**"
                     )
 
-            with col2:
-                if st.button("🎯 Ready for Quiz!"):
-                    st.session_state.current_step = 4
-                    st.success("✅ Moving to quiz mode!")
-                    st.rerun()
+                st.info(f"**💡 Explanation:** {quiz.get('explanation', 'N/A')}")
 
-    # ========================================================================
-    # TAB 3: QUIZ MODE
-    # ========================================================================
-    with tabs[2]:
-        st.markdown('<div class="section-header">🎯 Step 3: Test Your Knowledge</div>', unsafe_allow_html=True)
+                st.markdown("")
 
-        if not st.session_state.vocabulary:
-            st.warning("⚠️ No vocabulary available for quiz!")
-            st.info("Please complete Steps 1 and 2 first.")
-        else:
-            # Score display
-            col1, col2, col3 = st.columns(3)
+                st.button(
+                    "➡️ Next Question",
+                    type="primary",
+                    use_container_width=True,
+                    on_click=show_next_quiz,
+                )
 
-            with col1:
-                st.metric("✅ Correct", st.session_state.quiz_score)
-            with col2:
-                st.metric("📊 Total", st.session_state.quiz_total)
-            with col3:
-                if st.session_state.quiz_total > 0:
-                    accuracy = (
-                        st.session_state.quiz_score / st.session_state.quiz_total
-                    ) * 100
-                    st.metric("🎯 Accuracy", f"{accuracy:.1f}%")
-                else:
-                    st.metric("🎯 Accuracy", "0%")
 
-            st.markdown("---")
+def main():
+    """Main Streamlit app with complete pipeline."""
 
-            # Quiz state management
-            if "current_quiz" not in st.session_state:
-                st.session_state.current_quiz = None
-                st.session_state.quiz_answered = False
-                st.session_state.selected_answer = None
+    # Page configuration
+    st.set_page_config(
+        page_title="German B2 Learning Pipeline", page_icon="🇩🇪", layout="wide"
+    )
 
-            # Generate new question
-            col1, col2 = st.columns([3, 1])
+    # Custom CSS
+    st.markdown(APP_CSS, unsafe_allow_html=True)
 
-            with col1:
-                if (
-                    st.button("🎲 New Question", type="primary")
-                    or st.session_state.current_quiz is None
-                ):
-                    import random
+    # Header with modern design
+    st.markdown(HEADER_HTML, unsafe_allow_html=True)
 
-                    word_data = random.choice(st.session_state.vocabulary)
+    # Initialize session state
+    if "transcript" not in st.session_state:
+        set_transcript("")
+    if "vocabulary" not in st.session_state:
+        set_vocabulary([])
+    for key, value in SESSION_DEFAULTS.items():
+        st.session_state.setdefault(key, value)
+
+    # Shared by the sidebar and the Quiz tab. Every score change reruns the
+    # full app, so computing it here keeps it current.
+    if st.session_state.quiz_total > 0:
+        accuracy = (st.session_state.quiz_score / st.session_state.quiz_total) * 100
+        st.session_state.quiz_accuracy_text = f"{accuracy:.1f}%"
+    else:
+        st.session_state.quiz_accuracy_text = "0%"
 
-                    with st.spinner("Generating quiz question..."):
-                        quiz = generate_quiz_question(word_data)
+    # Sidebar - Progress tracker
+    with st.sidebar:
+        st.markdown("## 📊 Pipeline Progress")
 
-                        if quiz:
-                            st.session_state.current_quiz = quiz
-                            st.session_state.quiz_answered = False
-                            st.session_state.selected_answer = None
-                            st.rerun()
+        # Progress indicators with custom styling
+        steps = {
+            1: "🎤 Audio Input",
+            2: "📝 Transcription",
+            3: "📚 Vocabulary",
+            4: "🎯 Learning",
+        }
 
-            with col2:
-                if st.button("🔄 Reset Score"):
-                    st.session_state.quiz_score = 0
-                    st.session_state.quiz_total = 0
-                    st.rerun()
+        step_rows = []
+        for step_num, step_name in steps.items():
+            if step_num < st.session_state.current_step:
+                step_rows.append(f'<div class="step-success">✅ {step_name}</div>')
+            elif step_num == st.session_state.current_step:
+                step_rows.append(f'<div class="step-active">▶️ {step_name}</div>')
+            else:
+                step_rows.append(f'<div class="step-pending">⏸️ {step_name}</div>')
 
-            # Display quiz question
-            if st.session_state.current_quiz:
-                quiz = st.session_state.current_quiz
+        st.markdown("".join(step_rows), unsafe_allow_html=True)
 
-                st.markdown('<div class="section-header">📝 Complete the Sentence</div>', unsafe_allow_html=True)
-                st.markdown(f'<div class="quiz-question">{quiz["question"]}</div>', unsafe_allow_html=True)
+        st.markdown("---")
 
-                st.markdown("")
+        # Statistics
+        if st.session_state.transcript:
+            st.metric("Words in Transcript", st.session_state.transcript_word_count)
 
-                # Answer options as buttons
-                for i, option in enumerate(quiz["options"]):
-                    button_type = "secondary"
+        if st.session_state.vocabulary:
+            st.metric("Vocabulary Count", len(st.session_state.vocabulary))
 
-                    if st.session_state.quiz_answered:
-                        if i == quiz["correct"]:
-                            button_type = "primary"  # Correct answer
+        if st.session_state.quiz_total > 0:
+            st.metric("Quiz Accuracy", st.session_state.quiz_accuracy_text)
 
-                    if st.button(
-                        f"{chr(65+i)}. {option}",
-                        key=f"option_{i}",
-                        disabled=st.session_state.quiz_answered,
-                        use_container_width=True,
-                    ):
-                        st.session_state.selected_answer = i
-                        st.session_state.quiz_answered = True
-                        st.session_state.quiz_total += 1
+        st.markdown("---")
 
-                        if i == quiz["correct"]:
-                            st.session_state.quiz_score += 1
+        st.radio(
+            "Transcription engine",
+            list(TRANSCRIPTION_ENGINES),
+            format_func=TRANSCRIPTION_ENGINES.get,
+            key="engine",
+        )
 
-                        st.rerun()
+        st.markdown("---")
 
-                # Show result
-                if st.session_state.quiz_answered:
-                    st.markdown("---")
+        if st.button("🔄 Reset Pipeline"):
+            set_transcript("")
+            set_vocabulary([])
+            st.session_state.quiz_score = 0
+            st.session_state.quiz_total = 0
+            st.session_state.current_step = 1
+            st.rerun()
 
-                    if st.session_state.selected_answer == quiz["correct"]:
-                        st.success("🎉 **Correct!** Well done!")
-                    else:
-                        st.error(
-                            f"❌ **Wrong!** The correct answer is: **{quiz['options'][quiz['correct']]}**"
-                        )
+    # Main content
+    tabs = st.tabs(["🎤 Step 1: Audio Input", "📚 Step 2: Study", "🎯 Step 3: Quiz"])
 
-                    st.info(f"**💡 Explanation:** {quiz.get('explanation', 'N/A')}")
+    with tabs[0]:
+        audio_input_tab()
 
-                    st.markdown("")
+    with tabs[1]:
+        study_tab()
 
-                    if st.button(
-                        "➡️ Next Question", type="primary", use_container_width=True
-                    ):
-                        st.session_state.current_quiz = None
-                        st.session_state.quiz_answered = False
-                        st.session_state.selected_answer = None
-                        st.rerun()
+    with tabs[2]:
+        quiz_tab()
 
 
 if __name__ == "__main__":